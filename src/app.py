@@ -27,7 +27,6 @@ graph: dict[int, dict] = {
 if __name__ == "__main__":
     is_first_render: bool = False # currently False for easier development. in prod must be True
     app: QApplication = QApplication(sys.argv)
-    zoomed_app: QApplication = QApplication(sys.argv)
     window: MarketGraphWindow = MarketGraphWindow(
         graph=graph,
         size=QSize(1280, 720)
@@ -1,10 +1,11 @@
 import simcompanies_api
 import utils
 
+import numpy as np
 from PyQt6.QtCore import Qt
-from typing import Any, Literal, Optional, TypeAlias
+from typing import Literal, Optional, TypeAlias
 from PyQt6.QtGui import QWheelEvent, QMouseEvent
-from PyQt6.QtCore import QSize, QPoint
+from PyQt6.QtCore import QSize, QPoint, QTimer
 from PyQt6.QtWidgets import (QMainWindow, QPushButton, QWidget)
 
 
@@ -14,6 +15,10 @@ MIN_WINDOW_SIZE = QSize(100, 100)
 MOVE_SPEED = 0.7
 ZOOM_IN_SPEED = 1 - 0.2
 ZOOM_OUT_SPEED = 1 + 0.2
+# mouse events arriving within one frame are applied together
+FRAME_INTERVAL_MS = 16
+# two-digit hex of each color channel value
+_HEX: tuple[str, ...] = tuple(f"{i:02x}" for i in range(256))
 
 
 def scroll_degrees_y_to_zoom_rate(
@@ -27,45 +32,15 @@ def scroll_degrees_y_to_zoom_rate(
     return zoom_out_speed   
 
 
-class StyleSheet(dict):
-    """PyQt6 stylesheet arranged in dictionary for key-value access"""
-    def __init__(self, stylesheet: Optional[str] = None):
-        super().__init__()
-        if not stylesheet:
-            self.type: str = "null"
-            return 
-        
+def _get_hex_color(color: tuple[int, int, int]) -> str:
+    """Get "#rrggbb" representation of RGB color"""
+    return "#" + _HEX[color[0]] + _HEX[color[1]] + _HEX[color[2]]
+
 
-        self.type = stylesheet[:stylesheet.find("{")].strip()
-        parameters: str = stylesheet[stylesheet.find("{") + 1: stylesheet.find("}")].strip()
-        properties = stylesheet[stylesheet.find("}") + 1:].strip()
-
-        for parameter in parameters.strip().split(";"):
-            key = parameter[:parameter.find(':')].strip()
-            value = parameter[parameter.find(':') + 1:].strip()
-            # avoid empty parameters
-            if key and value:
-                self[key] = value
-
-        self.properties: dict[str, dict[str, Any]] = {}
-        while properties.strip():
-            property_ = properties[properties.find(":") + 1: properties.find("{")].strip()
-            property_parameters = properties[properties.find("{") + 1: properties.find("}")]
-            self.properties[property_] = {}
-            for property_parameter in property_parameters.strip().split(";"):
-                key = property_parameter[:property_parameter.find(':') ].strip()
-                value = property_parameter[property_parameter.find(':') + 1:].strip()
-                if key and value:
-                    self.properties[property_][key] = value
-            properties = properties[properties.find("}") + 1:]
-
-
-    def __str__(self):
-        ret = f"{self.type} {'{'}\n{' '.join([f"\t{key}: {value};\n" for key, value in self.items()])}{'}'}"
-        for property_name, property_parameters in self.properties.items():
-            ret += f"\n{self.type}:{property_name}" \
-                   f"{'{'}\n{' '.join([f"\t{key}: {value};\n" for key, value in property_parameters.items()])}\n{'}'}"
-        return ret
+def _get_color_parameters(background_color: Optional[str], text_color: Optional[str]) -> str:
+    """Stylesheet parameters for given colors, leaving not given ones default"""
+    return ((f"background-color: {background_color}; " if background_color else "")
+            + (f"color: {text_color};" if text_color else ""))
 
 
 class Button(QPushButton):
@@ -73,9 +48,37 @@ class Button(QPushButton):
     def __init__(self, text: Optional[str] = None, parent: Optional[QWidget] = None):
         
         super().__init__(text=text, parent=parent)
-        self.stylesheet = StyleSheet("QPushButton {}")
+        # colors as "#rrggbb", None means default
+        self._bg: Optional[str] = None
+        self._fg: Optional[str] = None
+        # scenario -> [background color, text color]
+        self._scenario_colors: dict[str, list[Optional[str]]] = {}
     
 
+    def _apply_colors(self) -> None:
+        """Set stylesheet of the button from its colors"""
+        stylesheet = f"QPushButton {{{_get_color_parameters(self._bg, self._fg)}}}"
+        for scenario, (bg, fg) in self._scenario_colors.items():
+            stylesheet += f" QPushButton:{scenario} {{{_get_color_parameters(bg, fg)}}}"
+        self.setStyleSheet(stylesheet)
+
+
+    def change_colors(self, background_color: tuple[int, int, int], text_color: Optional[tuple[int, int, int]] = None) -> None:
+        """
+        Change background and text colors of the button, updating its stylesheet once
+
+        Parameters
+        ----------
+        background_color: tuple[int, int, int]
+            RGB background color to switch to
+        text_color: tuple[int, int, int] (optional)
+            RGB text color to switch to. None means default text color
+        """
+        self._bg = _get_hex_color(background_color)
+        self._fg = None if text_color is None else _get_hex_color(text_color)
+        self._apply_colors()
+
+
     def change_background_color(self, color: tuple[int, int, int], scenario: Literal[None, "hover", "pressed"] = None) -> None:
         """
         Change background color of the button
@@ -85,12 +88,12 @@ class Button(QPushButton):
         color: tuple[int, int, int]
             RGB color to switch to
         """
-        hex_color = '%02x%02x%02x' % color
+        hex_color = _get_hex_color(color)
         if not scenario:
-            self.stylesheet["background-color"] = "#" + hex_color
+            self._bg = hex_color
         else: 
-            self.stylesheet.properties[scenario]["background-color"] = "#" + hex_color
-        self.setStyleSheet(str(self.stylesheet))
+            self._scenario_colors.setdefault(scenario, [None, None])[0] = hex_color
+        self._apply_colors()
     
 
     def change_text_color(self, color: tuple[int, int, int], scenario: Literal[None, "hover", "pressed"] = None):
@@ -102,12 +105,12 @@ class Button(QPushButton):
         color: tuple[int, int, int]
             RGB color to switch to
         """
-        hex_color = '%02x%02x%02x' % color
+        hex_color = _get_hex_color(color)
         if not scenario:
-            self.stylesheet["color"] = "#" + hex_color
+            self._fg = hex_color
         else: 
-            self.stylesheet.properties[scenario]["color-color"] = "#" + hex_color
-        self.setStyleSheet(str(self.stylesheet))
+            self._scenario_colors.setdefault(scenario, [None, None])[1] = hex_color
+        self._apply_colors()
 
 
 
@@ -119,6 +122,24 @@ class MainWindow(QMainWindow):
         self.max_size: QSize =QSize (round(1e4), round(1e4))
         self.zoomed_size: QSize = size
         self.move_mode = False
+        # widgets moved by dragging and zooming, filled by subclasses on render.
+        # their positions are kept in _xs and _ys, index-aligned with the list
+        self._graph_widgets: list[QWidget] = []
+        self._xs: np.ndarray = np.empty(0, dtype=np.int32)
+        self._ys: np.ndarray = np.empty(0, dtype=np.int32)
+
+        self._pending_movement = QPoint(0, 0)
+        self._move_timer = QTimer(self)
+        self._move_timer.setSingleShot(True)
+        self._move_timer.setInterval(FRAME_INTERVAL_MS)
+        self._move_timer.timeout.connect(self._flush_move)
+
+        self._pending_zoom_rates: list[float] = []
+        self._pending_zoom_center = QPoint(0, 0)
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(FRAME_INTERVAL_MS)
+        self._zoom_timer.timeout.connect(self._flush_zoom)
     
 
     def mousePressEvent(self, event: QMouseEvent | None):
@@ -138,20 +159,29 @@ class MainWindow(QMainWindow):
         if not self.move_mode:
             event.ignore()
             return
-        self.move_contents(
-            self.prev_mouse_pos - event.pos(),
-            move_speed=MOVE_SPEED
-        )
+        self._pending_movement += self.prev_mouse_pos - event.pos()
         self.prev_mouse_pos = event.pos()
+        if not self._move_timer.isActive():
+            self._move_timer.start()
+
+
+    def _flush_move(self) -> None:
+        """Apply movement accumulated since last frame"""
+        self.move_contents(self._pending_movement, move_speed=MOVE_SPEED)
+        self._pending_movement = QPoint(0, 0)
 
 
     def move_contents(self, movement: QPoint, move_speed: float = 1):
-        for widget in self.findChildren(QWidget):
-            if widget is None:
-                continue
-            pos = widget.pos()
-            new_pos = pos - movement * move_speed
-            widget.move(new_pos)
+        movement = movement * move_speed
+        self._xs -= movement.x()
+        self._ys -= movement.y()
+        self._move_graph_widgets()
+
+
+    def _move_graph_widgets(self) -> None:
+        """Move graph widgets to positions stored in _xs and _ys"""
+        for widget, x, y in zip(self._graph_widgets, self._xs.tolist(), self._ys.tolist()):
+            widget.move(x, y)
 
 
     def wheelEvent(self, event: QWheelEvent | None):
@@ -166,33 +196,49 @@ class MainWindow(QMainWindow):
             zoom_out_speed=ZOOM_OUT_SPEED
             )
         if zoom_rate != 1:
-            self.zoom(
-                event.position().toPoint(), 
-                zoom_rate, 
-                min_size=MIN_WINDOW_SIZE,
-                max_size=self.max_size
-                )
+            self._pending_zoom_rates.append(zoom_rate)
+            self._pending_zoom_center = event.position().toPoint()
+            if not self._zoom_timer.isActive():
+                self._zoom_timer.start()
         event.accept()
 
+
+    def _flush_zoom(self) -> None:
+        """
+        Apply zoom steps accumulated since last frame one at a time, like separate wheel events,
+        but move contents only once
+        """
+        rate: float = 1
+        for step in self._pending_zoom_rates:
+            if self._zoom_size(step, min_size=MIN_WINDOW_SIZE, max_size=self.max_size):
+                rate *= step
+        self._pending_zoom_rates.clear()
+        if rate != 1:
+            self._zoom_contents(self._pending_zoom_center, rate)
+
     
     def zoom(self, center: QPoint, rate: float, min_size: QSize, max_size: QSize):
         """Zoom contents of window. Zoom algorithm is same to Google Maps"""
+        if self._zoom_size(rate, min_size, max_size):
+            self._zoom_contents(center, rate)
+
+
+    def _zoom_size(self, rate: float, min_size: QSize, max_size: QSize) -> bool:
+        """Multiply zoomed size by rate, if it stays within boundaries. Returns whether it was updated"""
         zoomed_size = self.zoomed_size * rate
-        # if violates boundaries, don't update
         if zoomed_size.boundedTo(max_size) != zoomed_size:
-            return
+            return False
         if min_size.boundedTo(zoomed_size) != min_size:
-            return
+            return False
         self.zoomed_size = zoomed_size
-        for widget in self.findChildren(QWidget):
-            if widget is None:
-                continue
-            pos = widget.pos()
-            new_pos = (
-                round(center.x() + (pos.x() - center.x()) * rate),
-                round(center.y() + (pos.y() - center.y()) * rate)
-            )
-            widget.move(*new_pos)
+        return True
+
+
+    def _zoom_contents(self, center: QPoint, rate: float) -> None:
+        """Scale positions of graph widgets relative to center"""
+        self._xs = np.rint(center.x() + (self._xs - center.x()) * rate).astype(np.int32)
+        self._ys = np.rint(center.y() + (self._ys - center.y()) * rate).astype(np.int32)
+        self._move_graph_widgets()
 
 
 class MarketGraphWindow(MainWindow):
@@ -209,21 +255,30 @@ class MarketGraphWindow(MainWindow):
             Products in list values are end products, meaning they can't be used as input.
         """
         super().__init__(size)
-        self.graph: Graph = graph
+        # positions of last rendered graph and window size they were calculated for
+        self._pos_cache: Optional[tuple[tuple[int, int, int], dict[int, tuple[int, int]]]] = None
+        # buttons are reused between renders of same graph
+        self._buttons_by_id: dict[int, Button] = {}
+        self.graph = graph
         self.product_id_to_name: dict[int, str] = utils.load_json_keys_to_int("saved_data/product_id_to_name.json") # type: ignore
     
 
-    def _get_graph_max_depth(self,graph: Graph) -> int:
-        """
-        Find how nested the graph is.
-        """
-        def wrapper(graph, depth=0):
-            for item in graph:
-                if isinstance(graph[item], dict):
-                    depth = wrapper(graph[item], depth=depth+1)
-            return depth + 1
-        
-        return wrapper(graph)
+    @property
+    def graph(self) -> Graph:
+        return self._graph
+
+
+    @graph.setter
+    def graph(self, graph: Graph) -> None:
+        """Replace rendered graph, dropping everything computed from previous one"""
+        self._graph: Graph = graph
+        self._pos_cache = None
+        for button in self._buttons_by_id.values():
+            button.deleteLater()
+        self._buttons_by_id = {}
+        self._graph_widgets = []
+        self._xs = np.empty(0, dtype=np.int32)
+        self._ys = np.empty(0, dtype=np.int32)
 
 
     def _get_item_positions(
@@ -233,7 +288,7 @@ class MarketGraphWindow(MainWindow):
         ) -> dict[int, tuple[int, int]]:
         """
         Calculate positions of the graph for arranging it's items as buttons
-        in fixed-size GUI window.
+        in fixed-size GUI window. Graph is walked once, see utils.walk_graph.
 
         Parameters
         ----------
@@ -245,64 +300,16 @@ class MarketGraphWindow(MainWindow):
         Returns
         --------
         item_positions: dict[str, tuple[int, int]]
-            x and y positions of each graph item
+            x and y positions of each graph item.
+            Result for window's own graph is cached until size changes, so it must not be modified.
         """
-        
-
-        def wrapper(
-            graph: Graph, 
-            size: QSize,
-            depth: int=0,
-            x_step: int=0,
-            y_align:int=0
-        ) -> dict[int, tuple[int, int]]:
-            """
-            Parameters
-            ---------
-            graph: dict[str, list[str] | dict]
-                Graph for arranging
-            size: QSize
-                Size of the window to arrange graph in
-            depth: int (first call is 0)
-                Depth of current layer. Used with x_step to calculate x position.
-            x_step: int (first call is 0)
-                Gap between graph layers.
-            y_align: int (first call is 0)
-                Shift on y axis applied on item to align them on its parent 
-            
-            Returns
-            --------
-            item_positions: dict[str, tuple[int, int]]
-                x and y positions of each graph item
-            """
-            item_positions: dict[int, tuple[int, int]] = {}
-            y_step = round(size.height() / len(graph))
-            y_shift = round(size.height() / 2 / len(graph))
-            x = x_step * depth
-            for i, item in enumerate(graph):
-                y = y_step * i + y_shift + y_align
-                item_positions[item] = (x, y)
-                if isinstance(graph, dict):
-                    next_height = round(size.height() / len(graph))
-                    next_size = QSize(size.width(), next_height)
-                    item_positions.update(
-                        wrapper(
-                            graph=graph[item], # type: ignore
-                            size=next_size,
-                            depth=depth+1,
-                            x_step=x_step,
-                            y_align=y_step*i
-                        )
-                    ) 
-            return item_positions
-        
+        cache_key = (id(graph), size.width(), size.height())
+        if self._pos_cache is not None and self._pos_cache[0] == cache_key:
+            return self._pos_cache[1]
 
-        x_step = round(size.width() / self._get_graph_max_depth(graph))
-        item_positions = wrapper(
-            graph=graph,
-            size=size,
-            x_step=x_step
-        )
+        item_positions = dict(utils.walk_graph(graph, size.width(), size.height()))
+        if graph is self.graph:
+            self._pos_cache = (cache_key, item_positions)
         return item_positions
 
 
@@ -315,17 +322,36 @@ class MarketGraphWindow(MainWindow):
         update: bool (default is False)
             Whether to fetch new resources data or use saved one.
         """
-        unnested_graph: list = utils.unnest_graph(self.graph)
         self.setGeometry(0, 0, self.width(), self.height())
         positions: dict[int, tuple[int, int]] = self._get_item_positions(self.graph, self.size())
-        pphpls: dict[int, float] = simcompanies_api.get_PPHPLs(0, unnested_graph, update=update)
+        # graph items are enumerated once, all arrays below are aligned with this list
+        ids: list[int] = list(positions)
+        pphpls: dict[int, float] = simcompanies_api.get_PPHPLs(0, ids, update=update)
         max_value: float = max(pphpls.values())
 
-        for id, position in positions.items():
-            button = Button(self.product_id_to_name[id], self)
-            color = utils.get_mapped_red_to_green_color(pphpls[int(id)], 0, max_value)
-            button.change_background_color(color)
-            button.setToolTip(str(round(pphpls[int(id)],1)))
-            if (color[0] + color[1]) > 255 / 2:
-                button.change_text_color((0, 0, 0))
-            button.move(*position)
\ No newline at end of file
+        coordinates = np.array(list(positions.values()), dtype=np.int32).reshape(-1, 2)
+        values = np.fromiter((pphpls[id] for id in ids), dtype=np.float64, count=len(ids))
+        colors = utils.get_mapped_red_to_green_colors(values, 0, max_value)
+        # black text is more readable on bright backgrounds
+        dark_text = (colors[:, 0].astype(np.int32) + colors[:, 1] > 255 / 2).tolist()
+
+        # repaint once after all buttons are updated, not after each of them
+        self.setUpdatesEnabled(False)
+        try:
+            self._graph_widgets = []
+            for id, position, value, color, is_text_dark in zip(
+                    ids, coordinates.tolist(), values.tolist(), colors.tolist(), dark_text
+                ):
+                button = self._buttons_by_id.get(id)
+                if button is None:
+                    button = Button(self.product_id_to_name[id], self)
+                    self._buttons_by_id[id] = button
+                button.change_colors(tuple(color), (0, 0, 0) if is_text_dark else None)
+                button.setToolTip(str(round(value, 1)))
+                button.move(*position)
+                self._graph_widgets.append(button)
+        finally:
+            # enabling updates schedules the repaint
+            self.setUpdatesEnabled(True)
+        self._xs = coordinates[:, 0].copy()
+        self._ys = coordinates[:, 1].copy()
\ No newline at end of file
@@ -1,8 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 from http.client import HTTPException
-import json
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Any, Literal, Optional
+from urllib3.util.retry import Retry
 import warnings
 
 import utils
@@ -11,12 +13,35 @@ import utils
 MARKET_TICKER_UPDATE_PERIOD_MINUTES = 60 * 4
 # aerospace end products that aren't sellable to exchange
 AEROSPACE_END_PRODUCTS: list[int] = [90, 91, 92, 93, 94, 95, 96, 97, 99, 100]
+REQUEST_TIMEOUT_SECONDS = 10
+VWAPS_PATH = "saved_data/vwap_data.json"
+PPHPLS_PATH = "saved_data/pphpls.json"
+
+# one session for all requests, so connections to API hosts are kept alive and reused
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    # after last retry, response is returned to be reported as HTTPException by callers
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
 
 
 class SimcompaniesAPIError(Exception):
     ...
 
 
+# realm -> (VWAP data, its index built by _load_vwaps)
+_VWAP_INDEXES: dict[int, tuple[dict, dict[int, dict[int, float]]]] = {}
+# realm -> (resources info, its resources by id)
+_RESOURCE_INDEXES: dict[int, tuple[dict, dict[int, dict]]] = {}
+
+
+def _get_time_marker(date_time: datetime.datetime) -> str:
+    """Get time marker in format '%Y-%m-%dT%H:%M:%S.%fZ', truncating to milliseconds"""
+    return date_time.strftime("%Y-%m-%dT%H:%M:%S.") + f"{date_time.microsecond // 1000:03d}Z"
+
+
 def get_market_ticker(date_time: datetime.datetime, 
                       realm: Literal[0, 1],
                       get_last_marker: bool = False
@@ -38,15 +63,11 @@ def get_market_ticker(date_time: datetime.datetime,
     market_ticker: list[dict[str, str]]
         List containing data of each game resource's price
     """
-    def _get_time_marker(date_time: datetime.datetime):
-        """Get current time marker in format '%Y-%m-%dT%H:%M:%S.%fZ', truncating to milliseconds"""
-        return date_time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-    
-
     if get_last_marker:
         date_time -= datetime.timedelta(minutes=MARKET_TICKER_UPDATE_PERIOD_MINUTES)
     time_marker = _get_time_marker(date_time)
-    response = requests.get(f"https://www.simcompanies.com/api/v2/market-ticker/{realm}/{time_marker}/")
+    response = _SESSION.get(f"https://www.simcompanies.com/api/v2/market-ticker/{realm}/{time_marker}/",
+                            timeout=REQUEST_TIMEOUT_SECONDS)
     if response.status_code != 200:
         raise HTTPException("Failed to get market ticker")
 
@@ -83,26 +104,41 @@ def get_VWAPs(
     """
     if isinstance(resource_ids, int):
         resource_ids = [resource_ids]
+    vwaps: dict[int, float] = _load_vwaps(realm, update=update).get(quality, {})
+    if resource_ids is None:
+        return dict(vwaps)
+    not_found = [resource_id for resource_id in resource_ids if resource_id not in vwaps]
+    if not_found:
+        raise KeyError(f"{', '.join(list(map(str,not_found)))} not found in vwaps")
+    if len(resource_ids) == 1:
+        return vwaps[resource_ids[0]]
+    return {resource_id: vwaps[resource_id] for resource_id in resource_ids}
+
+
+def _load_vwaps(realm: Literal[0, 1], update: bool = False) -> dict[int, dict[int, float]]:
+    """
+    Get VWAPs of all resources in realm, indexed by quality and then by resource id.
+    Index is built once per fetched or saved VWAP data, so it's shared and must not be modified.
+    """
     vwap_data: dict[str, list[dict]] = {}
     if update:
-        response = requests.get(f"https://api.simcotools.app/v1/realms/{realm}/market/vwaps")
+        response = _SESSION.get(f"https://api.simcotools.app/v1/realms/{realm}/market/vwaps",
+                                timeout=REQUEST_TIMEOUT_SECONDS)
         if response.status_code != 200:
             raise HTTPException("Failed to get VWAPS")
         vwap_data = response.json()
-        with open("saved_data/vwap_data.json", "w") as f:
-            json.dump(vwap_data, f, indent='\t')
+        utils.write_json(VWAPS_PATH, vwap_data)
     else:
-        with open("saved_data/vwap_data.json") as f:
-            vwap_data = json.load(f)
-    vwaps: list[dict] = list(filter(lambda x: x["quality"] == quality, vwap_data["vwaps"]))
-    if resource_ids is not None:
-        vwaps = list(utils.select_included(vwaps, resource_ids, lambda x: x["resourceId"]))  # type: ignore
-        not_found = set(resource_ids) - set([vwap["resourceId"] for vwap in vwaps])# type: ignore
-        if not_found:
-            raise KeyError(f"{', '.join(list(map(str,not_found)))} not found in vwaps") # type: ignore
-        if len(resource_ids) == 1: # type: ignore
-            return vwaps[0]["vwap"]
-    return {vwap["resourceId"]: vwap["vwap"] for vwap in vwaps}
+        # same object is returned until file changes
+        vwap_data = utils.read_json(VWAPS_PATH)
+
+    if realm in _VWAP_INDEXES and _VWAP_INDEXES[realm][0] is vwap_data:
+        return _VWAP_INDEXES[realm][1]
+    index: dict[int, dict[int, float]] = {}
+    for vwap in vwap_data["vwaps"]:
+        index.setdefault(vwap["quality"], {})[vwap["resourceId"]] = vwap["vwap"]
+    _VWAP_INDEXES[realm] = (vwap_data, index)
+    return index
 
 
 def get_resources_info(
@@ -129,29 +165,35 @@ def get_resources_info(
     Returns
     ----------
     resource_data: dict[str, Any]
-        Dictionary with some metadata and mentioned resource data under "resources" key
+        Dictionary with some metadata and mentioned resource data under "resources" key.
+        Metadata and resource dictionaries are shared with saved data cache, so they must not be modified.
+        Use copy.deepcopy of result or utils.read_json_copy for that.
     """
     if isinstance(resource_ids, int):
         resource_ids = [resource_ids]
 
     resources_info: dict = {}
     if update:
-        response = requests.get(f"https://api.simcotools.app/v1/realms/{realm}/resources?disable_pagination=True")
+        response = _SESSION.get(f"https://api.simcotools.app/v1/realms/{realm}/resources?disable_pagination=True",
+                                timeout=REQUEST_TIMEOUT_SECONDS)
         if response.status_code != 200:
             raise HTTPException(f"Failed to get resources info: {response.status_code}")
         resources_info = response.json()
-        with open("saved_data/resources_info.json", "w") as f:
-            json.dump(resources_info, open("saved_data/resources_info.json", "w"), indent='\t')
+        utils.write_json("saved_data/resources_info.json", resources_info)
     else: 
-        resources_info = utils.load_json_keys_to_int("saved_data/resources_info.json")
+        resources_info = utils.read_json("saved_data/resources_info.json")
     
     resources: list = resources_info["resources"]
     metadata: dict = resources_info["metadata"]
     if resource_ids is not None:
-        resources = list(utils.select_included(resources, resource_ids, lambda x: x["id"])) # type: ignore
-        not_found = set(resource_ids) - set(resources) # type: ignore
+        # index is built once per fetched or saved resources info
+        if realm not in _RESOURCE_INDEXES or _RESOURCE_INDEXES[realm][0] is not resources_info:
+            _RESOURCE_INDEXES[realm] = (resources_info, {resource["id"]: resource for resource in resources})
+        resources_by_id: dict[int, dict] = _RESOURCE_INDEXES[realm][1]
+        not_found = [resource_id for resource_id in resource_ids if resource_id not in resources_by_id]
         if not_found:
             raise KeyError(f"{', '.join(list(map(str,not_found)))} not found in resources info") # type: ignore
+        resources = [resources_by_id[resource_id] for resource_id in resource_ids]
 
     
     return {"metadata": metadata, "resources": resources}
@@ -190,17 +232,18 @@ def get_PPHPLs(
         resource_ids = [resource_ids]
     pphpls: dict[int, float] = {}
     if not update:
-        pphpls = utils.load_json_keys_to_int("saved_data/pphpls.json") # type: ignore
-            
-        if resource_ids is not None:
-            pphpls = dict(utils.select_included(pphpls.items(), resource_ids, lambda x: x[0])) # type: ignore
-            not_found = set(resource_ids) - set(pphpls)# type: ignore
-            if not_found:
-                raise KeyError(f"{','.join(list(map(str,not_found)))} not found in pphpls") # type: ignore
-        return pphpls
+        pphpls = utils.load_json_keys_to_int(PPHPLS_PATH) # type: ignore
+        return _select_PPHPLs(pphpls, resource_ids)
     
 
-    resources_info: dict[str, Any] = get_resources_info(realm, update=update)
+    # resources info and VWAPs are fetched from different endpoints, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        resources_info_future = executor.submit(get_resources_info, realm, update=update)
+        vwaps_future = executor.submit(_load_vwaps, realm, update=update)
+        resources_info: dict[str, Any] = resources_info_future.result()
+        vwap_index: dict[int, dict[int, float]] = vwaps_future.result()
+    vwaps: dict[int, float] = vwap_index.get(quality, {})
+    input_vwaps: dict[int, float] = vwap_index.get(max(0, quality-1), {})
     for resource_data in resources_info["resources"]:
         # aerospace profit calculation isn't currently implemented 
         if resource_data["id"] in AEROSPACE_END_PRODUCTS:
@@ -208,21 +251,24 @@ def get_PPHPLs(
             warnings.warn(f"Skipping calculating PPHPL for resource {resource_data["id"]}"
                           " as aerospace end product pphpl calculation is not implemented yet")
             continue
-        vwap: float = get_VWAPs(realm, resource_data["id"], quality=quality, update=update) # type: ignore
-        update = False # don't update anymore
-        input_prices = [get_VWAPs(realm, int(input_id), quality=max(0, quality-1), update=update) 
-                        * 
-                        resource_data["inputs"][input_id]["quantity"] 
-                        for input_id in resource_data["inputs"]]
+        vwap: float = vwaps[resource_data["id"]]
+        input_price: float = sum(input_vwaps[int(input_id)] * resource_data["inputs"][input_id]["quantity"]
+                                 for input_id in resource_data["inputs"])
         production_speed: float = resource_data["producedAnHour"]
         wages: int = resource_data["wages"]
-        pphpl: float = (vwap - sum(input_prices)) * production_speed - wages * (1 + admin_overhead)
+        pphpl: float = (vwap - input_price) * production_speed - wages * (1 + admin_overhead)
         pphpls[resource_data["id"]] = pphpl
-    with open("saved_data/pphpls.json", "w") as f:
-        json.dump(pphpls, f, indent='\t')
-    pphpls = dict(utils.select_included(pphpls.items(), resource_ids, mapping=lambda x: x[0])) # type: ignore
-    not_found = set(resource_ids) - set(pphpls) # type: ignore
-    if not_found:
-        raise KeyError(f"{','.join(list(map(str,not_found)))} not found in pphpls") # type: ignore
+    utils.write_json(PPHPLS_PATH, pphpls)
+    return _select_PPHPLs(pphpls, resource_ids)
+
 
-    return pphpls
\ No newline at end of file
+def _select_PPHPLs(pphpls: dict[int, float], resource_ids: Optional[list[int]]) -> dict[int, float]:
+    """Pick PPHPLs of given resources, or all of them if resource_ids is None"""
+    if resource_ids is None:
+        return pphpls
+    ids = frozenset(resource_ids)
+    selected = {resource_id: pphpls[resource_id] for resource_id in ids if resource_id in pphpls}
+    not_found = ids - selected.keys()
+    if not_found:
+        raise KeyError(f"{','.join(list(map(str,not_found)))} not found in pphpls")
+    return selected
\ No newline at end of file
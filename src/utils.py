@@ -1,20 +1,130 @@
+import copy
+import functools
+from collections import deque
 import json
-from typing import Any, Iterable, Callable, Optional, TypeAlias
+import numpy as np
+import os
+from typing import Any, Iterator, TypeAlias
+
+try:
+    import orjson
+except ImportError: # orjson is optional and only makes json parsing faster
+    orjson = None # type: ignore
 
 
 Graph: TypeAlias = dict[int, dict]
 
 
-def unnest_graph(graph: Graph) -> list:
+def walk_graph(graph: Graph, width: int, height: int) -> Iterator[tuple[int, tuple[int, int]]]:
+    """
+    Walk graph once, arranging its items in a window of given size.
+    Each layer of the graph gets equal part of width, and each item
+    gets equal part of height given to its parent.
+
+    Parameters
+    ----------
+    graph: dict[int, list[int] | dict]
+        Graph for arranging
+    width: int
+        Width of the window to arrange graph in
+    height: int
+        Height of the window to arrange graph in
+
+    Returns
+    --------
+    items: Iterator[tuple[int, tuple[int, int]]]
+        Item and its x and y positions, for all items of graph in breadth-first order
+    """
+    # x depends on number of layers, so it's assigned after the walk
+    items: list[tuple[int, int, int]] = []
+    layers = 0
+    # breadth-first walk over groups of items sharing one parent:
+    # (items, depth of the group, height given to the group, y of the group's top)
+    queue: deque[tuple[Graph | list[int], int, int, int]] = deque([(graph, 0, height, 0)])
+    while queue:
+        group, depth, group_height, y_align = queue.popleft()
+        if not group:
+            continue
+        layers = depth + 1
+        y_step = group_height // len(group)
+        y_shift = group_height // (2 * len(group))
+        # lists hold end products, only dictionaries have nested items
+        has_children = isinstance(group, dict)
+        for i, item in enumerate(group):
+            items.append((item, depth, y_step * i + y_shift + y_align))
+            if has_children:
+                queue.append((group[item], depth + 1, y_step, y_align + y_step * i)) # type: ignore
+
+    if not layers:
+        return
+    x_step = width // layers
+    for item, depth, y in items:
+        yield item, (x_step * depth, y)
+
+
+@functools.lru_cache(maxsize=32)
+def _read_json_cached(path: str, mtime_ns: int, size: int) -> Any:
+    """Parse json file once per its modification time and size"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_json(path: str) -> Any:
+    """
+    Load json file, parsing it again only if file was changed since previous load.
+    Result is shared between calls, so it must not be modified. Use read_json_copy for that.
+
+    Parameters
+    ----------
+    path: str
+        Path of json file
+    """
+    stat = os.stat(path)
+    return _read_json_cached(path, stat.st_mtime_ns, stat.st_size)
+
+
+def read_json_copy(path: str) -> Any:
     """
-    Return all of keys and values of graph
+    Same as read_json, but returns deep copy safe to modify.
     """
-    items: list = []
-    for item in graph:
-        items.append(item)
-        if isinstance(graph, dict):
-            items.extend(unnest_graph(graph[item]))
-    return items
+    return copy.deepcopy(read_json(path))
+
+
+def write_json(path: str, obj: Any, pretty: bool = False) -> None:
+    """
+    Save object to json file. Integer dictionary keys are saved as strings.
+    File is written to disk and then replaced atomically, so readers never see it half-written.
+
+    Parameters
+    ----------
+    path: str
+        Path of json file
+    obj: Any
+        Json-serializable object
+    pretty: bool (default is False)
+        Whether to indent json with tabs for reading by human. Compact json is smaller and faster to load.
+    """
+    # orjson can't indent with tabs, so human-readable files are always written by json
+    if pretty:
+        data = json.dumps(obj, indent="\t").encode()
+    elif orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        data = json.dumps(obj, separators=(",", ":")).encode()
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 def load_json_keys_to_int(path: str, leave_not_digit: bool=False) -> dict[int | str, Any]:
@@ -29,9 +139,7 @@ def load_json_keys_to_int(path: str, leave_not_digit: bool=False) -> dict[int |
         If False, meeting not digit key will lead to error. 
         If True, key will be added to dictionary unedited. 
     """
-    with open(path) as f:
-        d: dict[str, Any] = json.load(f)
-    
+    d: dict[str, Any] = read_json(path)
     ret_d: dict[int | str, Any] = {}
     for k, v in d.items():
         if not k.isdigit() and leave_not_digit:
@@ -41,75 +149,44 @@ def load_json_keys_to_int(path: str, leave_not_digit: bool=False) -> dict[int |
     return ret_d
 
 
-def select_included(l: Iterable, a: Iterable, mapping: Optional[Callable] = None) -> filter:
+def get_mapped_red_to_green_colors(values: np.ndarray, min_value: float, max_value: float) -> np.ndarray:
     """
-    Pick only elements from one iterable that other iterable includes.
+    Get colors of values in range [min, max] based on assigned color spectrum from red to
+    green to given [min, max] range, where purest red is min, and green is max value.
+    For example, in range [0, 100] value 0 is (255, 0, 0) and 100 is (0, 255, 0).
 
     Parameters
+    ----------
+    values: np.ndarray
+        1D array of values to define colors of
+    min_value: float
+        Minimum value to map to
+    max_value: float
+        Maximum value to map to
+
+    Returns
     ---------
-    l: Iterable
-        Iterable to filter
-    a: Iterable
-        Values to pick from first terable
-    mapping: Callable (optional)
-        Function to apply to each element in first list before filtering
+    colors: np.ndarray
+        Array of shape (len(values), 3) with RGB colors as uint8.
     """
-    mapping_: Callable = (lambda x: x) if mapping is None else mapping # type: ignore
-    return filter(lambda x: mapping_(x) in a, l) # type: ignore[operator, arg-type]
-
-
-def get_mapped_red_to_green_color(value: float, min_value: float, max_value: float) -> tuple[int, int, int]:
-        """
-        Get color of a value in range [min, max] based on assigned color spectrum from red to
-        green to given [min, max] range, where purest red is min, and green is max value. 
-        
-        Parameters
-        ----------
-        value: float
-            Value to define color of
-        min_value: float
-            Minimum value to map to
-        max_value: float
-            Maximum value to map to
-
-        Returns
-        ---------
-        color: tuple[int, int, int]
-            Mapped color.
-
-        Examples
-        ----------
-        value=100
-        min_value=0
-        max_value=100
-
-        result: (0, 255, 0) # purest green
-        ---------
-        value=0
-        min_value=0
-        max_value=100
-
-        result: (255, 0, 0) # purest red
-        -------------------
-        value=50
-        min_value=0
-        max_value=100
-
-        result: (255, 255, 0) # purest yellow
-        """
-        if max_value < min_value:
-            raise ValueError(
-                f"Max value is less than min value ({max_value} < {min_value})"
-            )
-        if value < min_value or value > max_value:
-            raise ValueError(
-                f"Value {value:.2f} is out of [min,max] range [{min_value:.2f}, {max_value:.2f}]"
-            )
-        
-        blue = 0
-        # 256 * 2 - from green to red
-        step = 255 * 2 / (max_value - min_value)
-        pos: int = round(value * step)
-        green = max(0, pos - 255)
-        red = max(0, 255 - pos)
-        return (red, green, blue)
\ No newline at end of file
+    if max_value < min_value:
+        raise ValueError(
+            f"Max value is less than min value ({max_value} < {min_value})"
+        )
+    out_of_range = (values < min_value) | (values > max_value)
+    if out_of_range.any():
+        raise ValueError(
+            f"Value {values[out_of_range][0]:.2f} is out of [min,max] range [{min_value:.2f}, {max_value:.2f}]"
+        )
+    colors = np.zeros((len(values), 3), dtype=np.uint8)
+    if max_value == min_value:
+        # all values are equal to min
+        colors[:, 0] = 255
+        return colors
+
+    # 256 * 2 - from green to red
+    step = 255 * 2 / (max_value - min_value)
+    pos = np.rint((values - min_value) * step)
+    colors[:, 0] = np.clip(255 - pos, 0, 255)
+    colors[:, 1] = np.clip(pos - 255, 0, 255)
+    return colors